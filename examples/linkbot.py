@@ -44,7 +44,7 @@ class HTMLTitleParser(HTMLParser):
 
 
 class Linkbot(metaclass=JaykMeta):
-    def __init__(self, blacklist=[], follow_local_urls=False, max_urls=3, report_errors=True, **kwargs):
+    def __init__(self, blacklist=(), follow_local_urls=False, max_urls=3, report_errors=True, **kwargs):
         super().__init__(**kwargs)
         # user params
         self.blacklist = blacklist
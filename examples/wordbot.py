@@ -10,7 +10,7 @@ from jayk.cli.module import JaykMeta, jayk_command
 
 
 class Wordbot(metaclass=JaykMeta):
-    def __init__(self, leaderboard_database, wordlist, words_per_hour=50, hours_per_round=6, ignore=[], leaderboard_timeout=300, **kwargs):
+    def __init__(self, leaderboard_database, wordlist, words_per_hour=50, hours_per_round=6, ignore=(), leaderboard_timeout=300, **kwargs):
         super().__init__(**kwargs)
         # user params
         self.leaderboard_database = leaderboard_database
@@ -215,7 +215,7 @@ class IRCChatbot(Chatbot, irc.ClientProtocol):
                 self.error('invalid IRC PING message received: %s', message)
                 return
             msg = message.params[0]
-            if msg[0] != ':':
+            if not msg.startswith(':'):
                 msg = ':' + msg
             self._send_command('PONG', msg)
         elif message.command == 'JOIN':
@@ -257,23 +257,21 @@ class IRCChatbot(Chatbot, irc.ClientProtocol):
         super().connection_made(transport)
         self.on_connect()
 
-    def data_received(self, data):
+    def _line_received(self, line: str):
         """
-        Hooks into the IRC client protocol's data_received and calls some events after the
+        Hooks into the IRC client protocol's _line_received and calls some events after the
         superclass's method is called.
 
-        :param data: the data received. This is passed on to _handle_irc_message, and then
-                     on_message.
+        :param line: the line received. This is parsed, and passed on to _handle_irc_message, and
+                     then on_message.
         """
-        super().data_received(data)
-        lines = data.decode().split("\r\n")
-        for line in filter(len, lines):
-            try:
-                message = irc.Message.parse(str(line))
-            except ValueError as e:
-                self.error("%s", e)
-            else:
-                self._handle_irc_message(message)
+        super()._line_received(line)
+        try:
+            message = irc.Message.parse(line)
+        except ValueError as e:
+            self.error("%s", e)
+        else:
+            self._handle_irc_message(message)
 
     def __try_next_nick(self):
         """
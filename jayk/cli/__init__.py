@@ -5,16 +5,18 @@ Base CLI entry point and basic driver definitions.
 import os.path as path
 import asyncio
 import logging
+import signal
 import sys
-from copy import deepcopy
+from copy import copy
 
 from ..util import LogMixin
 from .module import HelpModule, jayk_chatbot_factory
 from .config import *
-from .util import FileListener
+from .util import register_file_watch
 
 
 log = logging.getLogger(__name__)
+_DRIVER_LOG = log.getChild('JaykDriver')
 
 
 class JaykDriver(LogMixin):
@@ -27,12 +29,13 @@ class JaykDriver(LogMixin):
         Creates a new driver with the specified configuration.
         :param config: the configuration to create this driver from.
         """
-        super().__init__("{}.JaykDriver".format(__name__))
+        super().__init__(_DRIVER_LOG)
         self.config = config
         self.bots = {}  # A list of bots, keyed by running servers
         self.loop = asyncio.get_event_loop()
         self.__running = False
-        self.__config_listener = FileListener(config.config_path, self.__config_changed)
+        self.__config_listener = None
+        self.__connect_tasks = set()  # the event loop only keeps weak references to its tasks
         for server in self.config.servers:
             self.initialize_bot(server)
 
@@ -48,7 +51,9 @@ class JaykDriver(LogMixin):
         Event that is fired whenever the configuration is changed for this driver.
         """
         # TODO : Locking
-        new_config = deepcopy(self.config)
+        # reload() replaces the servers rather than modifying them, so a shallow copy is enough to
+        # keep the current configuration intact
+        new_config = copy(self.config)
         new_config.reload()
         self.update_config(new_config)
 
@@ -94,35 +99,54 @@ class JaykDriver(LogMixin):
     def bot_connect(self, server: str):
         """
         Initializes a connection with a bot. The driver must be running for this to be allowed.
+
+        The connection is scheduled as a task on the event loop, rather than being run here.
         """
         assert self.running
+        task = self.loop.create_task(self._connect(server))
+        self.__connect_tasks.add(task)
+        task.add_done_callback(self.__connect_tasks.discard)
+
+    async def _connect(self, server: str):
+        """
+        Coroutine which makes the connection for a single bot. Any connection errors are logged
+        rather than raised, so that one bad server does not stop the others from connecting.
+        """
         self.info("Making connection for %s", server)
         bot = self.bots[server]
         try:
-            coro = self.loop.create_connection(lambda: bot, bot.connect_info.server,
-                                               bot.connect_info.port)
-            self.loop.run_until_complete(coro)
+            await self.loop.create_connection(lambda: bot, bot.connect_info.server,
+                                              bot.connect_info.port)
         except Exception as ex:
             self.error("Could not connect to %s: %s", server, ex)
 
+    def __interrupted(self):
+        """
+        Signal handler for SIGINT, which stops the event loop.
+        """
+        self.info("ctrl-C caught; exiting")
+        self.loop.stop()
+
     def run_forever(self):
         """
         Starts the bot driver running... forever.
         """
         assert not self.running
         self.__running = True
-        for server_name in self.bots:
-            self.bot_connect(server_name)
-
-        self.__config_listener.start()
+        # Make all of the initial connections concurrently, on a single pass of the loop
+        connections = [self._connect(server_name) for server_name in self.bots]
+        self.loop.run_until_complete(asyncio.gather(*connections))
+
+        # The config file is watched from the event loop, so config changes are handled in it too
+        self.__config_listener = register_file_watch(self.loop, self.config.config_path,
+                                                     self.__config_changed)
+        self.loop.add_signal_handler(signal.SIGINT, self.__interrupted)
         try:
             self.loop.run_forever()
-        except KeyboardInterrupt:
-            self.info("ctrl-C caught; exiting")
-            self.loop.stop()
+        finally:
+            self.loop.remove_signal_handler(signal.SIGINT)
             self.info("Stopping config file watcher")
             self.__config_listener.stop()
-            self.__config_listener.join()
         self.loop.close()
 
 
@@ -165,4 +189,3 @@ def jayk():
 # * ssl support
 # * new CLI class that handles things
 # * better async code now that I know how to do it
-# * async file watching (instead of current hackneyed multi-process watching)
@@ -2,10 +2,13 @@
 CLI-specific configuration.
 """
 
+import os
 import os.path as path
 import logging
 import json
 import hashlib
+from functools import partial
+from types import MappingProxyType
 from .util import AttrDict
 from ..common import connect_info_factory
 
@@ -16,20 +19,38 @@ __all__ = ["JaykConfigError", "JaykConfig"]
 log = logging.getLogger(__name__)
 
 
+# Default settings for modules. Only immutable values live here, since the same template is shared
+# by every module configuration.
+_MODULE_DEFAULTS = MappingProxyType({
+    'rooms': (),
+    'enabled': True,
+    'path': None,
+})
+
+
 def module_defaults(module_config):
     """
     Applies default settings to modules if they aren't present in the given configuration
     """
-    defaults = {
-        'rooms': [],
-        'params': {},
-        'enabled': True,
-        'path': None,
-    }
-    for k, v in defaults.items():
-        if k not in module_config:
-            module_config[k] = v
-    return module_config
+    config = AttrDict(_MODULE_DEFAULTS)
+    # update() rather than keyword arguments, since config keys don't have to be strings
+    config.update(module_config)
+    if 'params' not in config:
+        # params is mutable, so each module gets its own
+        config.params = AttrDict()
+    return config
+
+
+def _freeze(value):
+    """
+    Converts a configuration value into something hashable, so it can be used as a cache key.
+    Lists become tuples, and dicts become frozensets of their (frozen) items.
+    """
+    if isinstance(value, dict):
+        return frozenset((k, _freeze(v)) for k, v in value.items())
+    elif isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
 
 
 class JaykConfigError(Exception):
@@ -49,6 +70,8 @@ class JaykConfig:
         self.config_path = None         # configuration path
         self.servers = {}               # list of servers by server configuration
         self.__config_hash = None       # hash of current server configuration
+        self.__connect_info_cache = {}  # connect info objects, keyed by their frozen parameters
+        self.__config_stat = None       # stat signature of the config file when it was last read
 
         # Discover and parse the configuration
         self.reload()
@@ -62,10 +85,25 @@ class JaykConfig:
         h = hashlib.sha256(config_str.encode('ascii'))
         return h.hexdigest()
 
+    @staticmethod
+    def __stat_signature(stat):
+        """
+        Helper function that boils a file's stat result down to the parts that tell us whether it
+        has been changed.
+        """
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
     def reload(self):
         """
         Discovers the config location, and parses it into an object that makes sense.
+
+        If the config file has not been touched since it was last read, it is not read again.
         """
+        if self.config_path is not None:
+            signature = JaykConfig.__stat_signature(os.stat(self.config_path))
+            if signature == self.__config_stat:
+                log.debug("%s is unchanged; skipping reload", self.config_path)
+                return
         config = AttrDict(self.discover()).infect()
 
         # Check if any changes actually need to be made
@@ -81,10 +119,12 @@ class JaykConfig:
         """
         Searches around for a config file that we can use in the current directory.
         """
-        configs = {'bots.json': json.loads}
+        configs = {'bots.json': json.load}
         try:
             import yaml
-            configs['bots.yaml'] = configs['bots.yml'] = yaml.load
+            # Prefer the libyaml-backed safe loader when it's available
+            loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+            configs['bots.yaml'] = configs['bots.yml'] = partial(yaml.load, Loader=loader)
         except ImportError:
             log.debug("could not import YAML; skipping searching for bots.yaml and bots.yml")
         # first time initialization
@@ -96,9 +136,11 @@ class JaykConfig:
                     break
             if self.config_path is None:
                 raise FileNotFoundError(', '.join(configs.keys()))
+        # Parse straight from the file, rather than reading it into a string first
         with open(self.config_path) as fp:
-            contents = fp.read()
-        return configs[self.config_path](contents)
+            # Take the signature from the file that's actually being read
+            self.__config_stat = JaykConfig.__stat_signature(os.fstat(fp.fileno()))
+            return configs[self.config_path](fp)
 
     def update(self, config):
         """
@@ -106,11 +148,30 @@ class JaykConfig:
         consistent and sane.
         """
         # Get server connect info
-        self.servers.clear()
+        # The server configs have already been infected by reload(), so they are wrapped directly
+        # rather than walking the whole tree again.
+        # A new dict is built rather than clearing the old one, since a copy of this config may
+        # still be sharing it
+        servers = {}
+        connect_info_cache = {}
         for server in config:
             server_type = server.type
-            self.servers[server.server] = AttrDict({
-                'connect_info': connect_info_factory(server_type, **server),
-                'modules': {n: module_defaults(m) for n, m in server.modules.items()} \
-                           if 'modules' in server else {},
-            }).infect()
+            # Reuse the previous connect info if none of the connection parameters have changed.
+            # Modules are not connection parameters, so they're left out of the key.
+            key = (server_type, _freeze({k: v for k, v in server.items() if k != 'modules'}))
+            connect_info = self.__connect_info_cache.get(key)
+            if connect_info is None:
+                connect_info = connect_info_factory(server_type, **server)
+            connect_info_cache[key] = connect_info
+            modules = AttrDict({n: module_defaults(m) for n, m in server.modules.items()}) \
+                      if 'modules' in server else AttrDict()
+            servers[server.server] = AttrDict({
+                'connect_info': connect_info,
+                'modules': modules,
+                # Modules that are enabled, as (name, config) pairs; this only depends on the
+                # configuration, so it is computed once here instead of on every bot update
+                'enabled_modules': tuple((n, m) for n, m in modules.items() if m.enabled),
+            })
+        self.servers = servers
+        # Only keep connect info for servers that are still around
+        self.__connect_info_cache = connect_info_cache
@@ -1,4 +1,7 @@
 """Jayk-specific chatbot modules, with extended configuration reloading."""
+import logging
+import os
+import sys
 from typing import Optional
 
 from .config import JaykConfig
@@ -37,14 +40,11 @@ class JaykState:
                     equivalent of the "modules" section in the bots.yaml file for the cli
                     configuration.
         """
-        modules = set()
-        rooms = set()
-        for module_name, module in config.items():
-            if not module.enabled:
-                continue
-            modules |= {module_name}
-            # Assume all rooms
-            rooms |= set(module.rooms)
+        enabled = [(module_name, module) for module_name, module in config.items()
+                   if module.enabled]
+        modules = {module_name for module_name, _ in enabled}
+        # Assume all rooms
+        rooms = set().union(*(module.rooms for _, module in enabled))
         return JaykState(modules, rooms)
 
 
@@ -53,7 +53,7 @@ class JaykChatbot(LogMixin):
     The base chatbot that sits on a network, waiting for messages. Messages that this chatbot
     receives are multiplexed by channel and passed down to listening implementations.
     """
-    __module_cache = {}
+    __module_cache = {}  # (mtime, module class) pairs, keyed by path
 
     def __init__(self, config):
         """
@@ -85,11 +85,16 @@ class JaykChatbot(LogMixin):
                                          'are you sure it derives from jayk.chatbot.Chatbot?'
 
         # Make sure that no disabled modules are included
-        # make sure that this is an attrdict because it's how we'll be accessing it
-        new_config = util.AttrDict(new_config).infect()
-        new_config.modules = util.AttrDict({
-            name: mod for name, mod in new_config.modules.items() if mod.enabled
-        })
+        # Only the top level and the module configs are accessed as attributes here, so only those
+        # are wrapped as attrdicts; the rest of the tree is left as it is. Copying the top level
+        # also keeps the caller's config from being modified below.
+        new_config = util.AttrDict(new_config)
+        if 'enabled_modules' in new_config:
+            # JaykConfig has already worked out which modules are enabled
+            new_config.modules = util.AttrDict(new_config.enabled_modules)
+        else:
+            modules = ((name, util.AttrDict(mod)) for name, mod in new_config.modules.items())
+            new_config.modules = util.AttrDict((name, mod) for name, mod in modules if mod.enabled)
 
         # Create the new desired state, and get it to match
         self.config = new_config
@@ -112,20 +117,20 @@ class JaykChatbot(LogMixin):
         can be overridden.
         """
         self.debug("Matching desired modules")
-        old_modules = set(self.state.modules)
-        new_modules = set(self.config.modules.keys())
-
-        to_add = new_modules - old_modules
-        to_remove = old_modules - new_modules
-        to_update = new_modules & old_modules
-
-        for remove in to_remove:
-            self.unload_module(remove)
-        for add in to_add:
-            self.load_module(add, self.config.modules[add])
-        for update in to_update:
-            self.update_module(update, self.config.modules[update])
-        self.state.modules = set(self.modules.keys())
+        old_modules = self.state.modules
+        new_modules = self.config.modules
+
+        # Unload first, so old and new modules aren't all resident at once
+        for name in old_modules:
+            if name not in new_modules:
+                self.unload_module(name)
+        # Everything else is either loaded for the first time, or updated
+        for name, module_config in new_modules.items():
+            if name in old_modules:
+                self.update_module(name, module_config)
+            else:
+                self.load_module(name, module_config)
+        self.state.modules = frozenset(self.modules)
 
     def match_desired_rooms(self):
         """
@@ -176,19 +181,52 @@ class JaykChatbot(LogMixin):
     def get_module(self, name, path):
         """
         Gets a module for this chatbot using the given name and path. If the module has already been
-        loaded, then it will return a cached version (indexed by path).
+        loaded, then it will return a cached version (indexed by path). If the file has been
+        modified since it was cached, it is loaded again.
 
         :param name: the name of the module to retrieve.
         :param path: the to the module.
         """
-        if path in JaykChatbot.__module_cache:
-            self.debug("Using cached module for %s", name)
-            return JaykChatbot.__module_cache[path]
+        module_cache = JaykChatbot.__module_cache
+        mtime = os.stat(path).st_mtime_ns
+        cached = module_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        self.debug("Importing module %s (path: %s)", name, path)
+        loaded_module = util.load_module(name, path)
+        module_cache[path] = (mtime, loaded_module)
+        return loaded_module
+
+
+# Maximum length, in bytes, of a comma-separated room list in a single JOIN or PART. IRC lines are
+# limited to 512 bytes including the command and CRLF; this leaves plenty of room for those.
+ROOM_PARAMS_MAX = 450
+
+
+def _chunk_csv(items, limit):
+    """
+    Joins the given strings with commas, splitting them up into as many strings as necessary to keep
+    each one's encoded length within the limit. A single item longer than the limit is yielded on
+    its own.
+
+    :param items: the strings to join.
+    :param limit: the maximum length of each joined string, in bytes.
+    """
+    batch = []
+    size = 0
+    for item in items:
+        item_size = len(item.encode())
+        if batch and size + 1 + item_size > limit:
+            yield ','.join(batch)
+            batch = []
+        if batch:
+            # Each item after the first also needs a comma
+            size += 1 + item_size
         else:
-            self.debug("Importing module %s (path: %s)", name, path)
-            loaded_module = util.load_module(name, path)
-            self.__module_cache[path] = loaded_module
-            return loaded_module
+            size = item_size
+        batch.append(item)
+    if batch:
+        yield ','.join(batch)
 
 
 class JaykIRCChatbot(JaykChatbot, IRCChatbot):
@@ -206,6 +244,9 @@ class JaykIRCChatbot(JaykChatbot, IRCChatbot):
                        may include the specialized connection info for this class, or a sequence of
                        chatbot modules to install immediately upon construction.
         """
+        # Set when the rooms that we're in have changed, and need to be synced with the desired
+        # rooms
+        self._rooms_dirty = False
         IRCChatbot.__init__(self, **kwargs)
         JaykChatbot.__init__(self, config)
 
@@ -225,19 +266,33 @@ class JaykIRCChatbot(JaykChatbot, IRCChatbot):
         self.info("Syncing current rooms with desired rooms")
 
         # Sync rooms
-        old_rooms = set(self.state.rooms)
-        new_rooms = set(self.desired_state.rooms)
-        self.debug("Old rooms: %s", old_rooms)
-        self.debug("New rooms: %s", new_rooms)
+        old_rooms = self.state.rooms
+        new_rooms = self.desired_state.rooms
+        logger = self._logger
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Old rooms: %s", old_rooms)
+            logger.debug("New rooms: %s", new_rooms)
 
         to_leave = old_rooms - new_rooms
         to_join = new_rooms - old_rooms
         if to_leave:
             self.info("Leaving these rooms: %s", to_leave)
-            self._send_command("PART", ",".join(to_leave))
+            self._send_room_command("PART", to_leave)
         if to_join:
             self.info("Joining these rooms: %s", to_join)
-            self._send_command("JOIN", ",".join(to_join))
+            self._send_room_command("JOIN", to_join)
+
+    def _send_room_command(self, command: str, rooms):
+        """
+        Sends a command which takes a comma-separated list of rooms (e.g. JOIN or PART). The rooms
+        are split across as many commands as necessary to keep each message under the IRC line
+        length limit.
+
+        :param command: the command to send.
+        :param rooms: the rooms to send the command for.
+        """
+        for room_list in _chunk_csv(rooms, ROOM_PARAMS_MAX):
+            self._send_command(command, room_list)
 
     def on_ready(self):
         """
@@ -250,13 +305,16 @@ class JaykIRCChatbot(JaykChatbot, IRCChatbot):
     def _handle_irc_message(self, message: irc.Message):
         """
         Overrides the _handle_irc_message method to update the state, if necessary. This
-        implementation checks to see if 'KICK', 'JOIN', or 'PART' messages were sent - if so, it
-        will attempt to re-join all desired rooms.
+        implementation checks to see if the message caused this chatbot to join or leave a room
+        (e.g. a 'KICK', 'JOIN', or 'PART' for us) - if so, it will attempt to re-join all desired
+        rooms.
 
         :param message: the message that was sent to this chatbot.
         """
         super()._handle_irc_message(message)
-        if message.command.upper() in ['KICK', 'JOIN', 'PART']:
+        # Other users joining and leaving rooms can't change our rooms, so there's nothing to sync
+        if self._rooms_dirty:
+            self._rooms_dirty = False
             self.match_desired_rooms()
 
     def on_join_room(self, room: str, who: Optional[str]):
@@ -269,7 +327,8 @@ class JaykIRCChatbot(JaykChatbot, IRCChatbot):
                     the chatbot (us).
         """
         if who is None:
-            self.state.rooms |= {room}
+            self.state.rooms.add(room)
+            self._rooms_dirty = True
         super().on_join_room(room, who)
 
     def on_leave_room(self, room: str, who: Optional[str]):
@@ -282,7 +341,8 @@ class JaykIRCChatbot(JaykChatbot, IRCChatbot):
                     chatbot (us).
         """
         if who is None:
-            self.state.rooms -= {room}
+            self.state.rooms.discard(room)
+            self._rooms_dirty = True
         super().on_leave_room(room, who)
 
 
@@ -293,6 +353,10 @@ class JaykModule(ChatbotModule):
     """
     A cli-specific chatbot module.
     """
+    # These are filled in for each class by JaykMeta
+    commands = {}
+    _command_prefixes = ()
+
     def __init__(self, config, **kwargs):
         """
         Creates a new Jayk chatbot module with the specified configuration. All additional keyword
@@ -317,11 +381,14 @@ class JaykModule(ChatbotModule):
         :param sender: the person who sent this message.
         :param message: the content of the entire message as a string.
         """
-        parts = message.split()
-        if parts:
-            cmd = parts[0]
-            if cmd in self.commands:
-                self.commands[cmd](self, client, cmd, room, sender, message)
+        # Most messages aren't commands, so check for a command prefix before looking any further,
+        # and even then only the first word is needed
+        stripped = message.lstrip()
+        if stripped.startswith(self._command_prefixes):
+            cmd = stripped.split(None, 1)[0]
+            function = self.commands.get(cmd)
+            if function is not None:
+                function(self, client, cmd, room, sender, message)
 
     def update_config(self, module_config):
         """
@@ -397,29 +464,60 @@ class JaykMeta(type):
         is created to make sure that all of the decorated commands are called when necessary while
         still passing unhandled messages to the `on_message()` override.
         """
-        # Add the jaykmodule class if necessary
-        if not any(map(lambda b: isinstance(b, JaykModule), bases)):
+        # Add the jaykmodule class if necessary. The bases are classes, so this is a subclass check.
+        if JaykModule not in bases and not any(issubclass(b, JaykModule) for b in bases):
             bases += (JaykModule,)
         result = type.__new__(mcs, name, bases, dict(namespace))
         # Add command functions if necessary
         functions = [function for function in namespace.values()
                      if hasattr(function, "_jayk_commands")]
-        result.commands = {}
-        for function in functions:
-            for cmd in function._jayk_commands:
-                result.commands[cmd] = function
+        result.commands = {cmd: function for function in functions
+                           for cmd in function._jayk_commands}
+        # Every command has to start with one of these, so most messages can be rejected with a
+        # single startswith() call
+        result._command_prefixes = tuple(result.commands)
         # Override the on_message method if it's defined in this class to ignore all commands, only
-        # if they're defined
-        if result.commands and 'on_message' in namespace:
-            result.__on_message_wrapped = result.on_message
-            def on_message_wrapper(self, client, room, sender, msg):
-                parts = msg.split(' ')
-                if parts and parts[0] in self.commands:
-                    cmd = parts[0]
-                    self.commands[cmd](self, client, cmd, room, sender, msg)
-                else:
-                    self.__on_message_wrapped(client, room, sender, msg)
+        # if they're defined. Like JaykModule.on_message, the generated methods look up the commands
+        # on self, so a subclass that calls them through super() dispatches its own commands rather
+        # than these.
+        #
+        # Generated methods remember what they replaced in _jayk_wrapped, so a subclass can generate
+        # its own from the same starting point, using its own commands.
+        commands = result.commands
+        on_message = result.on_message
+        base_on_message = getattr(on_message, '_jayk_wrapped', on_message)
+        if base_on_message is JaykModule.on_message:
+            # No override anywhere, so the default on_message can be specialized for this class
+            if not commands:
+                # Nothing to dispatch to; ignore messages entirely
+                def on_message_dispatch(self, client, room, sender, msg):
+                    pass
+            else:
+                # This has to behave exactly like JaykModule.on_message, which it stands in for
+                def on_message_dispatch(self, client, room, sender, msg):
+                    stripped = msg.lstrip()
+                    if stripped.startswith(self._command_prefixes):
+                        cmd = stripped.split(None, 1)[0]
+                        function = self.commands.get(cmd)
+                        if function is not None:
+                            function(self, client, cmd, room, sender, msg)
+            on_message_dispatch._jayk_wrapped = base_on_message
+            result.on_message = on_message_dispatch
+        elif commands and ('on_message' in namespace or base_on_message is not on_message):
+            wrapped = base_on_message
+            def on_message_wrapper(self, client, room, sender, msg, _wrapped=wrapped):
+                if msg.startswith(self._command_prefixes):
+                    cmd = msg.partition(' ')[0]
+                    function = self.commands.get(cmd)
+                    if function is not None:
+                        function(self, client, cmd, room, sender, msg)
+                        return
+                _wrapped(self, client, room, sender, msg)
+            on_message_wrapper._jayk_wrapped = wrapped
             result.on_message = on_message_wrapper
+        elif base_on_message is not on_message:
+            # A base class's wrapper has no commands of ours to dispatch
+            result.on_message = base_on_message
         return result
 
 
@@ -443,7 +541,7 @@ def jayk_command(cmd, *cmds):
     :param cmds: any other commands that this function should react to.
     """
     def wrapper(function):
-        function._jayk_commands = [cmd] + list(cmds)
+        function._jayk_commands = [sys.intern(c) for c in (cmd,) + cmds]
         return function
     return wrapper
 
@@ -467,6 +565,10 @@ def jayk_chatbot_factory(connect_info: common.ConnectInfo, **kwargs):
 ################################################################################
 
 
+# Width of the header lines in !help output; headers are padded out to it with dashes.
+HELP_WIDTH = 40
+
+
 class HelpModule(metaclass=JaykMeta):
     """
     A basic help module that displays all available modules for use. This is sort of a special
@@ -477,6 +579,9 @@ class HelpModule(metaclass=JaykMeta):
         Creates the new help module. Doesn't take any extra arguments.
         """
         super().__init__(config={}, **kwargs)
+        # Rooms grow as module help is added, so keep our own set to update in place
+        self.rooms = set(self.rooms)
+        # (module, rendered help lines) pairs, so the lines go away along with their module
         self.help_sections = []
 
     @jayk_command("!help")
@@ -488,29 +593,29 @@ class HelpModule(metaclass=JaykMeta):
         # commands.
         # TODO : help section breakdown
         # parts = msg.split()
-        help_lines = []
-
-        HELP_WIDTH = 40
-        # HELP_TAIL = '-' * HELP_WIDTH
-        for module in self.help_sections:
-            # Header
-            module_name = type(module).name()
-            header_line = '- {} '.format(module_name)
-            header_line += '-' * (HELP_WIDTH - len(header_line))
-            # Command info
-            about_line = type(module).about()
-            commands_line = "Available commands: {}".format(', '.join(module.commands.keys()))
-            help_lines += [header_line, about_line, commands_line]
-            # TODO : room info
-        for line in help_lines:
-            if line:  # Don't send blank lines
+        for _module, help_lines in self.help_sections:
+            for line in help_lines:
                 client.send_message(sender.nick, line)
+            # TODO : room info
+
+    @staticmethod
+    def __make_help_lines(module_type):
+        """
+        Renders the help lines for a module class. Everything here comes from the class, so this
+        only needs to be done once per module.
+        """
+        # Header
+        header_line = '- {} '.format(module_type.name()).ljust(HELP_WIDTH, '-')
+        # Command info
+        about_line = module_type.about()
+        commands_line = "Available commands: {}".format(', '.join(module_type.commands))
+        # Don't send blank lines
+        return tuple(filter(None, (header_line, about_line, commands_line)))
 
     def add_module_help(self, module):
         """
-        Adds a help string for the given module. In actuality, it just adds a pointer to the module
-        itself so we don't have to update module strings every time we're in the mood to
-        unload/reload a module.
+        Adds a help section for the given module. The help text is rendered here and kept next to
+        the module in its section, so unloading or reloading a module means replacing its section.
         """
-        self.help_sections += [module]
-        self.state.rooms |= set(module.rooms)
+        self.help_sections.append((module, HelpModule.__make_help_lines(type(module))))
+        self.rooms.update(module.rooms)
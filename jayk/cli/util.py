@@ -1,119 +1,279 @@
 """Common utilities among the CLI to use."""
-from threading import Thread
+import asyncio
 import importlib.util
-import multiprocessing as mp
-from queue import Empty as EmptyQueue
-import time
-import inotify.adapters
+import os
+import struct
+import sys
+import inotify.calls
 import inotify.constants
 from ..util import LogMixin
 
 
-class FileProcess(mp.Process):
+# Types of inotify events that don't mean that a watched file was modified
+IGNORED_EVENTS = frozenset(['IN_CLOSE_NOWRITE', 'IN_MOVED_TO', 'IN_OPEN', 'IN_DELETE_SELF',
+                            'IN_MOVE_SELF', 'IN_ACCESS'])
+
+# The fixed-size part of an inotify event: the watch descriptor, the event mask, a cookie, and the
+# length of the name that follows it
+INOTIFY_EVENT = struct.Struct('iIII')
+
+# Enough to read a good number of events at once. Events for a watched file have no name, so this
+# is always big enough for at least one event.
+INOTIFY_READ_SIZE = 4096
+
+
+def event_names(mask):
+    """
+    Gets the names of all of the inotify event types that are set in an event mask.
+
+    :param mask: the event mask.
+    """
+    return [name for bit, name in inotify.constants.MASK_LOOKUP.items() if mask & bit]
+
+
+class InotifyMultiplexer(LogMixin):
     """
-    A single, dedicated process which watches a file.
+    Watches every registered path using a single inotify file descriptor, which is read by an
+    asyncio event loop whenever it has events waiting. Each event is passed along to every callback
+    registered for its watch.
+
+    The kernel hands out one watch descriptor per file, so different paths to the same file (or the
+    same path registered more than once) share a watch. The watch is only removed once the last
+    callback for it has been unregistered.
+
+    There is one of these for each event loop that is watching something; use
+    `InotifyMultiplexer.instance(loop)` to get it. It closes itself once nothing is being watched.
     """
-    def __init__(self, listen_path, queue):
+    __instances = {}  # multiplexers, keyed by their event loop
+
+    @staticmethod
+    def instance(loop):
+        """
+        Gets the multiplexer for an event loop, creating a new one if necessary.
+
+        :param loop: the event loop that the multiplexer reads events in.
         """
-        Creates a new file watcher process object with the given listen path and IPC queue.
+        multiplexer = InotifyMultiplexer.__instances.get(loop)
+        if multiplexer is None:
+            multiplexer = InotifyMultiplexer.__instances[loop] = InotifyMultiplexer(loop)
+        return multiplexer
 
-        :param listen_path: the path to watch.
-        :param queue: the queue to use for sending and receiving messages across processes.
+    def __init__(self, loop):
         """
-        super().__init__()
-        self.listen_path = listen_path if listen_path is bytes else listen_path.encode('ascii')
-        self.queue = queue
-        self.notify = inotify.adapters.Inotify()
+        Creates a new multiplexer with nothing registered, and starts reading its events.
 
-    def run(self):
+        :param loop: the event loop to read events in.
         """
-        Behavior implementation of this process.
+        LogMixin.__init__(self, InotifyMultiplexer.__name__)
+        self.loop = loop
+        self.fd = inotify.calls.inotify_init()
+        self.__watchers = {}  # lists of (path, callback) pairs, keyed by watch descriptor
+        self.__unwatched = []  # (path, callback) pairs whose file went away, to be watched again
+        loop.add_reader(self.fd, self.__read_events)
+
+    def register(self, path, callback):
+        """
+        Starts watching a path.
+
+        :param path: the encoded path to watch.
+        :param callback: the function to call with the event type names whenever an event happens
+                         to the path.
+        """
+        self.debug("Watching %s", path)
+        self.__add_watch((path, callback))
+
+    def unregister(self, path, callback):
+        """
+        Stops calling a callback for a path. Once nothing is being watched, the multiplexer is
+        closed.
+
+        :param path: the encoded path to stop watching.
+        :param callback: the callback that the path was registered with.
         """
-        self.notify.add_watch(self.listen_path)
-        # TODO : abstract away the inotify parts, and use a directory watcher instead
-        while True:
-            try:
-                for event in self.notify.event_gen():
-                    if not event:
-                        continue
-                    (_, type_names, _, _) = event
-                    if 'IN_IGNORED' in type_names:
-                        # XXX : give it a chance to make a new file
-                        # No real workaround beyond waiting for the disk to catch up
-                        time.sleep(1.0)
-                        self.notify.add_watch(self.listen_path)
-                    self.queue.put(event)
-            except Exception as ex:
-                self.queue.put(ex)
+        self.debug("No longer watching %s", path)
+        watcher = (path, callback)
+        if watcher in self.__unwatched:
+            self.__unwatched.remove(watcher)
+        for wd, watchers in self.__watchers.items():
+            if watcher in watchers:
+                watchers.remove(watcher)
+                if not watchers:
+                    # Nothing else is watching this file
+                    del self.__watchers[wd]
+                    try:
+                        inotify.calls.inotify_rm_watch(self.fd, wd)
+                    except Exception:
+                        # The watch goes away by itself when the file is removed
+                        self.debug("Watch for %s was already removed", path)
+                break
+        if not self.__watchers and not self.__unwatched:
+            self.close()
 
+    def close(self):
+        """
+        Stops reading events, and closes the inotify file descriptor.
+        """
+        if self.fd is None:
+            return
+        self.debug("Closing")
+        self.loop.remove_reader(self.fd)
+        os.close(self.fd)
+        self.fd = None
+        if InotifyMultiplexer.__instances.get(self.loop) is self:
+            del InotifyMultiplexer.__instances[self.loop]
+
+    def __add_watch(self, watcher):
+        """
+        Adds an inotify watch for a path, or adds to the existing watch if its file is already
+        being watched.
 
-class FileListener(Thread, LogMixin):
+        :param watcher: the (encoded path, callback) pair to watch for.
+        """
+        wd = inotify.calls.inotify_add_watch(self.fd, watcher[0], inotify.constants.IN_ALL_EVENTS)
+        self.__watchers.setdefault(wd, []).append(watcher)
+
+    def __read_events(self):
+        """
+        Reads all of the events waiting on the inotify file descriptor, and dispatches them. This is
+        called by the event loop.
+        """
+        try:
+            data = os.read(self.fd, INOTIFY_READ_SIZE)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            (wd, mask, _, name_length) = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size + name_length
+            watchers = self.__watchers.get(wd)
+            if watchers is None:
+                continue
+            if mask & inotify.constants.IN_IGNORED:
+                # The kernel has dropped this watch, since its file is gone
+                del self.__watchers[wd]
+                self.__unwatched.extend(watchers)
+                # XXX : give it a chance to make a new file
+                # No real workaround beyond waiting for the disk to catch up
+                self.loop.call_later(1.0, self.__rewatch, watchers)
+            type_names = event_names(mask)
+            # Callbacks may unregister themselves, so go over a copy
+            for _, callback in tuple(watchers):
+                try:
+                    callback(type_names)
+                except Exception:
+                    self.exception('Unexpected error')
+
+    def __rewatch(self, watchers):
+        """
+        Watches paths again after their file has been replaced, if they're still registered.
+
+        :param watchers: the (encoded path, callback) pairs that were watching the file.
+        """
+        for watcher in watchers:
+            if watcher in self.__unwatched and self.fd is not None:
+                try:
+                    self.__add_watch(watcher)
+                except Exception:
+                    self.exception('Could not watch %s again', watcher[0])
+                else:
+                    self.__unwatched.remove(watcher)
+
+
+class FileListener(LogMixin):
     """
     A class that watches a given path for modification. If that file is changed, the callback is
     called.
+
+    Events are read in an asyncio event loop, and the callback is called from the same loop.
     """
-    def __init__(self, listen_path, callback):
+    def __init__(self, listen_path, callback, coalesce_ms=50, loop=None):
         """
         Creates a new FileListener over the given path, and a callback for what to do when the file
         is modified.
 
         :param listen_path: the path to listen for modifications.
         :param callback: the method to call when the file is modified.
+        :param coalesce_ms: how long to wait, in milliseconds, for more modifications after the
+                            first one before calling the callback. All modifications in that window
+                            only call the callback once.
+        :param loop: the event loop to watch the file in. Defaults to the current event loop.
         """
         LogMixin.__init__(self, "FileListener({})".format(listen_path))
-        Thread.__init__(self)
+        if not isinstance(listen_path, bytes):
+            listen_path = listen_path.encode('ascii')
+        self.listen_path = listen_path
         self.callback = callback
-        self.running = False
-        self.queue = mp.Queue()
-        self.process = FileProcess(listen_path, self.queue)
+        self.coalesce_ms = coalesce_ms
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+        self.__multiplexer = None
+        self.__pending = None  # the handle for the callback, while modifications are being gathered
 
-    def run(self):
+    def start(self):
         """
-        Starts the watcher for this path in another thread.
+        Starts watching this path.
         """
         self.debug("Starting watcher")
-        assert not self.running
-        assert self.queue is not None, "File listener has already completed; create a new one"
-        self.process.start()
-        self.running = True
-        ignore = {'IN_CLOSE_NOWRITE', 'IN_MOVED_TO', 'IN_OPEN', 'IN_DELETE_SELF', 'IN_MOVE_SELF',
-                  'IN_ACCESS'}
-        while self.running:
-            try:
-                event = self.queue.get(True, 0.1)
-                if isinstance(event, Exception):
-                    # raise this event as an exception if it is one
-                    raise event
-                if event is None:
-                    continue
-                (_, type_names, _, _) = event
-                if 'IN_IGNORED' in type_names:
-                    self.debug("Watched file was (re)moved; attempting to set up another watcher")
-                elif not bool(ignore & set(type_names)):
-                    self.debug("inotify event(s) triggered callback: %s", type_names)
-                    self.callback()
-            except EmptyQueue:
-                # ignore empty queue exceptions. these are raised by queue.get after timing out
-                pass
-            except Exception:
-                self.exception('Unexpected error')
-        self.debug("Cleaning up")
-        self.remove_watch()
-
-    def remove_watch(self):
-        """
-        Stops our watcher process.
-        """
-        self.debug("Removing watcher")
-        self.process.terminate()
+        assert self.__multiplexer is None, "File listener has already been started"
+        self.__multiplexer = InotifyMultiplexer.instance(self.loop)
+        self.__multiplexer.register(self.listen_path, self.__on_event)
+
+    def __on_event(self, type_names):
+        """
+        Called by the multiplexer for every event on this path.
+
+        :param type_names: the names of the event's types.
+        """
+        # An event only counts as a modification if none of its types are ignored
+        for type_name in type_names:
+            if type_name == 'IN_IGNORED':
+                self.debug("Watched file was (re)moved; attempting to set up another watcher")
+                return
+            if type_name in IGNORED_EVENTS:
+                return
+        self.debug("inotify event(s) triggered callback: %s", type_names)
+        # A single save in an editor is usually several events, so gather up whatever else comes
+        # in shortly after and only call the callback once for all of them
+        if self.__pending is None:
+            self.__pending = self.loop.call_later(self.coalesce_ms / 1000, self.__fire)
+
+    def __fire(self):
+        """
+        Calls the callback, once the modifications have been gathered up.
+        """
+        self.__pending = None
+        try:
+            self.callback()
+        except Exception:
+            self.exception('Unexpected error')
 
     def stop(self):
         """
-        Stops this thread from watching.
+        Stops watching this path.
         """
         self.debug("Stopping")
-        self.running = False
-        self.remove_watch()
+        if self.__multiplexer is not None:
+            self.__multiplexer.unregister(self.listen_path, self.__on_event)
+            self.__multiplexer = None
+        pending = self.__pending
+        if pending is not None:
+            pending.cancel()
+            self.__pending = None
+
+
+def register_file_watch(loop, path, callback, coalesce_ms=50):
+    """
+    Starts watching a file for modification in an event loop.
+
+    :param loop: the event loop to watch the file in.
+    :param path: the path to watch.
+    :param callback: the method to call, in the event loop, when the file is modified.
+    :param coalesce_ms: how long to wait, in milliseconds, for more modifications after the first
+                        one before calling the callback.
+    :return: the FileListener for the file, whose stop() method stops watching it.
+    """
+    listener = FileListener(path, callback, coalesce_ms=coalesce_ms, loop=loop)
+    listener.start()
+    return listener
 
 
 class AttrDict(dict):
@@ -131,13 +291,7 @@ class AttrDict(dict):
         """
         Attempts to convert all dictionaries in this AttrDict to AttrDicts themselves.
         """
-        for k in self:
-            v = self[k]
-            if isinstance(v, list):
-                self[k] = self.infect_list(v)
-            elif isinstance(v, dict):
-                self[k] = AttrDict(v)
-                self[k].infect()
+        AttrDict.__infect_all([self])
         return self
 
     def infect_list(self, seq):
@@ -145,9 +299,31 @@ class AttrDict(dict):
         Runs `AttrDict.infect` on every item in the provided if they are dicts and
         `AttrDict.infect_list` on every item in the provided list if they are lists themselves.
         """
-        return [AttrDict(v).infect() if isinstance(v, dict) else
-                self.infect_list(v) if isinstance(v, list) else v
-                for v in seq]
+        seq = list(seq)
+        AttrDict.__infect_all([seq])
+        return seq
+
+    @staticmethod
+    def __infect_all(stack):
+        """
+        Converts every dict inside of the given containers into an AttrDict, and copies every list,
+        all the way down. The containers themselves are modified in place.
+
+        The tree is walked with an explicit stack instead of recursion, so deeply nested
+        configurations don't cost a call per level.
+
+        :param stack: a list of the dicts and lists to start from.
+        """
+        while stack:
+            container = stack.pop()
+            items = container.items() if isinstance(container, dict) else enumerate(container)
+            for k, v in items:
+                if isinstance(v, dict):
+                    container[k] = v = AttrDict(v)
+                    stack.append(v)
+                elif isinstance(v, list):
+                    container[k] = v = list(v)
+                    stack.append(v)
 
 
 class JaykException(Exception):
@@ -156,21 +332,45 @@ class JaykException(Exception):
     """
 
 
+# Package name that loaded bot modules are registered under in sys.modules. This keeps them from
+# shadowing (or being shadowed by) regular modules with the same name.
+MODULE_PACKAGE = 'jayk.modules'
+
+
 def load_module(module_name, path):
     """
-    Loads a Python file as a module.
+    Loads a Python file as a module. Loaded modules are registered in `sys.modules`, so loading the
+    same file a second time will not import it again, unless it has been modified in the meantime.
 
     :param module_name: the name of the module.
     :param path: the path to the module.
     """
     from .module import JaykMeta
-    # Step 1: import
-    spec = importlib.util.spec_from_file_location(module_name, path)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    # Step 2: find the jayk bot
-    for item in dir(module):
-        cls = getattr(module, item)
-        if isinstance(cls, JaykMeta):
-            return cls
+    modules = sys.modules
+    qualified_name = '{}.{}'.format(MODULE_PACKAGE, module_name)
+    # Step 1: import, unless this version of the file has already been imported under this name
+    mtime = os.stat(path).st_mtime_ns
+    module = modules.get(qualified_name)
+    if module is None or os.path.abspath(module.__file__) != os.path.abspath(path) \
+            or getattr(module, '_jayk_mtime', None) != mtime:
+        old_module = module
+        spec = importlib.util.spec_from_file_location(qualified_name, path)
+        module = importlib.util.module_from_spec(spec)
+        module._jayk_mtime = mtime
+        # Registered before it runs, the same way that importlib registers regular modules
+        modules[qualified_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            if old_module is None:
+                del modules[qualified_name]
+            else:
+                modules[qualified_name] = old_module
+            raise
+    # Step 2: find the jayk bot, skipping any that the module imported from elsewhere. From Python
+    # 3.6 on, the module's globals are in definition order, so this is the first bot it defines.
+    name = module.__name__
+    for item in vars(module).values():
+        if isinstance(item, JaykMeta) and item.__module__ == name:
+            return item
     raise JaykException("No valid module was found in {}".format(path))
@@ -6,6 +6,8 @@ class ConnectInfo(object):
     Base connection info for a bot to connect. This is encouraged to be overridden for each new bot
     strategy implemented, although it is not required.
     """
+    __slots__ = ('server', 'port')
+
     def __init__(self, server: str, port: int):
         """
         Creates a new ConnectInfo with the specified server and port.
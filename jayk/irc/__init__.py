@@ -2,7 +2,7 @@
 
 import re
 import asyncio
-import functools
+import logging
 from abc import ABCMeta, abstractmethod
 from typing import *
 from ..util import LogMixin
@@ -18,31 +18,29 @@ class User:
     An IRC user.
 
     """
+    __slots__ = ('nick', 'username', 'host')
+
     def __init__(self, nick, username, host):
         self.nick = nick
         self.username = username
         self.host = host
 
-    RE = re.compile("(?P<nick>[^!]+)!(?P<user>[^@]+)@(?P<host>.+)")
-
     @staticmethod
     def parse(s: str):
         """
-        Parses an IRC user string into a coherent user object. This is the regular expression used:
+        Parses an IRC user string into a coherent user object. User strings look like this:
 
         ```
-        (?P<nick>[^!]+)!(?P<user>[^@]+)@(?P<host>.+)
+        <nick>!<user>@<host>
         ```
 
         :param s: the username string to be parsed.
-        :raises: ValueError when the user string does not match the regular expression.
+        :raises: ValueError when any part of the user string is missing.
         """
-        match = User.RE.match(s)
-        if not match:
+        nick, _, rest = s.partition('!')
+        username, _, host = rest.partition('@')
+        if not (nick and username and host):
             raise ValueError("Invalid user pattern")
-        nick = match.group('nick')
-        username = match.group('user')
-        host = match.group('host')
         return User(nick, username, host)
 
 
@@ -50,6 +48,8 @@ class ConnectInfo(common.ConnectInfo):
     """
     IRC-specific connect info.
     """
+    __slots__ = ('nicks', 'user', 'server_pass', 'ssl')
+
     def __init__(self, server: str, nicks: Sequence[str], user: str,
                  port: Optional[int] = None, server_pass: Optional[str] = None,
                  ssl: Optional[bool] = None, **_):
@@ -81,72 +81,170 @@ class ConnectInfo(common.ConnectInfo):
             self.ssl = ssl
 
 
+# Placeholder for a message's user before its prefix has been parsed, since None means there is no
+# user
+_UNPARSED = object()
+
+
 class Message(object):
     """
     An IRC message with an optional prefix, a command, and optional parameters.
     """
+    __slots__ = ('_prefix', '_command', '_params', '_user', '_wire')
+
     def __init__(self, prefix: Optional[str], command: str, params: Sequence[str]):
         """
         Creates an IRC message. This constructor does no validation of parameters beforehand.
         :param prefix: the prefix for the message.
         :param command: the command to pass, as a string.
-        :param params: the parameters to pass.
-        """
-        self.prefix = prefix
-        if prefix is not None:
-            try:
-                self.user = User.parse(self.prefix)
-            except ValueError:
-                self.user = None
-        else:
-            self.user = None
-        self.command = command
-        self.params = params
+        :param params: the parameters to pass. These are stored as a tuple.
+        """
+        self._prefix = prefix
+        self._user = _UNPARSED
+        self._command = command
+        self._params = tuple(params)
+        self._wire = None  # the formatted message, once it has been formatted
+
+    # The parsed user and the formatted message are cached, so setting any of the parts of the
+    # message throws them away.
+
+    @property
+    def prefix(self):
+        """
+        Gets the prefix for this message, or None if it doesn't have one.
+        """
+        return self._prefix
+
+    @prefix.setter
+    def prefix(self, prefix: Optional[str]):
+        self._prefix = prefix
+        self._user = _UNPARSED
+        self._wire = None
+
+    @property
+    def command(self):
+        """
+        Gets the command for this message.
+        """
+        return self._command
+
+    @command.setter
+    def command(self, command: str):
+        self._command = command
+        self._wire = None
+
+    @property
+    def params(self):
+        """
+        Gets the parameters for this message, as a tuple.
+        """
+        return self._params
+
+    @params.setter
+    def params(self, params: Sequence[str]):
+        self._params = tuple(params)
+        self._wire = None
+
+    @property
+    def user(self):
+        """
+        Gets the user who sent this message, or None if it wasn't sent by a user (e.g. it came from
+        the server). The prefix is only parsed the first time this is asked for.
+        """
+        user = self._user
+        if user is _UNPARSED:
+            prefix = self._prefix
+            user = None
+            # Server prefixes are never user strings, so don't bother trying to parse them
+            if prefix is not None and '!' in prefix and '@' in prefix:
+                try:
+                    user = User.parse(prefix)
+                except ValueError:
+                    pass
+            self._user = user
+        return user
 
     def __str__(self):
         """
-        Formats the IRC message for sending, excluding CRLF.
+        Formats the IRC message for sending, excluding CRLF. This is only done again if the message
+        has been changed since it was last formatted.
         :return:
         """
-        message = ''
-        if self.prefix:
-            message += ':{} '.format(self.prefix)
-        message += self.command.upper()
-        if self.params:
-            message += " {}".format(' '.join(self.params))
+        message = self._wire
+        if message is None:
+            message = ''
+            if self._prefix:
+                message += ':{} '.format(self._prefix)
+            message += self._command.upper()
+            if self._params:
+                message += " {}".format(' '.join(self._params))
+            self._wire = message
         return message
 
-    MESSAGE_RE = re.compile('^(:(?P<prefix>[^ ]+) )?'
-                            '(?P<command>[a-zA-Z]+|[0-9]{3})'
-                            '(?P<params>( [^: \r\n]+)*)'
-                            '(?P<trailing> :[^\r\n]+)?$',
-                            re.MULTILINE)
+    def to_wire_bytes(self):
+        """
+        Formats the IRC message for sending, including CRLF, as bytes.
+        """
+        return str(self).encode() + b'\r\n'
+
+    # Commands are either made of letters, or are three-digit numeric replies. IRC commands are
+    # always ASCII, so there's no need for unicode matching.
+    COMMAND_RE = re.compile('[a-zA-Z]+|[0-9]{3}', re.ASCII)
+
     @staticmethod
     def parse(line: str):
         """
         Parses an IRC message.
+
+        This is scanned through by hand rather than with a regular expression, since it happens for
+        every line the server sends. The message is split up as follows:
+
+        ```
+        [:<prefix> ]<command>[ <param>]*[ :<trailing>]
+        ```
+
         :param line: the message to parse
         :raises ValueError: if the line is malformed.
         :return: the parsed message
         """
-        match = Message.MESSAGE_RE.match(line)
-        if not match:
+        # Prefix
+        if line.startswith(':'):
+            end = line.find(' ')
+            if end < 2:
+                raise ValueError("invalid IRC message: {}".format(line))
+            prefix = line[1:end]
+            start = end + 1
+        else:
+            prefix = None
+            start = 0
+        # Command
+        end = line.find(' ', start)
+        if end == -1:
+            end = len(line)
+        command = line[start:end]
+        if not Message.COMMAND_RE.fullmatch(command):
             raise ValueError("invalid IRC message: {}".format(line))
-        prefix = match.group('prefix')
-        command = match.group('command')
-        try:
-            command = response.CODE_TO_NAME[int(command)]
-        except (KeyError, ValueError):
+        if command.isdigit():
             # it's okay if we can't translate this code - it just means we won't have a legit
             # translation of what it means
-            pass
-        params = list(filter(len, match.group('params').split(' ')))
-        trailing = match.group('trailing')
-        if trailing:
-            params += [trailing[2:]]
+            command = response.CODE_TO_NAME.get(int(command), command)
+        # Params; everything after the first ' :' is a single trailing param. The middle params
+        # start with a space, which is skipped, and are normally separated by exactly one space, so
+        # empty params only need to be filtered out when there is more than one.
+        middle, trailing_sep, trailing = line[end:].partition(' :')
+        params = middle[1:].split(' ') if middle else []
+        if '' in params:
+            params = [param for param in params if param]
+        if trailing_sep:
+            params.append(trailing)
         return Message(prefix, command, params)
 
 
+# IRC lines are at most 512 bytes, so this much data without a line ending means something is wrong
+# with the server or the connection.
+INCOMING_MAX = 4096
+
+
 class ClientProtocol(asyncio.Protocol, LogMixin, metaclass=ABCMeta):
     """
     The IRC asyncio protocol implementation.
@@ -157,6 +255,9 @@ class ClientProtocol(asyncio.Protocol, LogMixin, metaclass=ABCMeta):
         """
         self.connect_info = connect_info
         self.transport = None
+        self.__outgoing = []  # encoded messages waiting to be written to the transport
+        self.__incoming = bytearray()  # data received that doesn't make up a whole line yet
+        self.__discarding = False  # set while skipping the rest of a line that was too long
         LogMixin.__init__(self, "{}@{}".format(connect_info.user, connect_info.server))
 
     def connection_made(self, transport):
@@ -165,14 +266,51 @@ class ClientProtocol(asyncio.Protocol, LogMixin, metaclass=ABCMeta):
         self.transport = transport
 
     def data_received(self, data):
-        for line in filter(len, data.decode().split('\r\n')):
-            self.debug("%s", line)
+        incoming = self.__incoming
+        incoming += data
+        # Lines may be split across reads, so anything after the last line ending is kept until the
+        # rest of it arrives. Lines should end with CRLF, but some servers only send LF.
+        end = incoming.rfind(b'\n')
+        if end == -1:
+            lines = ()
+        else:
+            lines = incoming[:end].split(b'\n')
+            del incoming[:end + 1]
+            if self.__discarding:
+                # The first line is the end of the one that was too long
+                lines = lines[1:]
+                self.__discarding = False
+        if len(incoming) > INCOMING_MAX:
+            self.error("dropping %d bytes received without a line ending", len(incoming))
+            incoming.clear()
+            self.__discarding = True
+        elif self.__discarding:
+            # Nothing is buffered while the rest of the line that was too long is skipped
+            incoming.clear()
+        for line in lines:
+            if line.endswith(b'\r'):
+                line = line[:-1]
+            if line:
+                self._line_received(line.decode(errors='replace'))
+
+    def _line_received(self, line: str):
+        """
+        Called for every complete, non-empty line received from the IRC server.
+
+        :param line: the line that was received, without its line ending.
+        """
+        # This is called for every line, so the level is checked here instead of in self.debug
+        logger = self._logger
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s", line)
 
     def connection_lost(self, exc):
         # exc is either an exception or None
         # see: https://docs.python.org/3/library/asyncio-protocol.html#asyncio.BaseProtocol.connection_lost
         self.info("connection lost")
         self.transport = None
+        self.__incoming.clear()
+        self.__discarding = False
         # TODO : auto-reconnect module
         # TODO : auto-reconnect module would require coupling between the protocol and the chatbot?
         #        chatbot is not aware of its connection to any server.
@@ -189,11 +327,34 @@ class ClientProtocol(asyncio.Protocol, LogMixin, metaclass=ABCMeta):
         Sends a message to the IRC server.
         :param msg: the message structured to send.
         """
-        # use a variable here because otherwise it gets calculated twice; in the log and when it's
-        # used
-        msg_str = str(msg)
-        self.debug("%s", msg_str)
-        self.transport.write("{}\r\n".format(msg_str).encode())
+        if self.transport is None:
+            self.error("not connected; dropping message: %s", msg)
+            return
+        # The message only gets formatted once, whether or not it's logged. This is called for
+        # every message, so the level is checked here instead of in self.debug
+        logger = self._logger
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s", msg)
+        outgoing = self.__outgoing
+        if not outgoing:
+            # Anything else that is sent before the event loop gets around to this is written
+            # along with this message, all at once
+            asyncio.get_event_loop().call_soon(self.__flush_outgoing)
+        outgoing.append(msg.to_wire_bytes())
+
+    def __flush_outgoing(self):
+        """
+        Writes all of the messages that have been sent since the last flush to the transport.
+        """
+        outgoing = self.__outgoing
+        self.__outgoing = []
+        if self.transport is None:
+            # The connection was lost after these were sent
+            self.warning("connection lost; dropping %d outgoing messages", len(outgoing))
+            return
+        # The messages are handed over as they are, rather than being copied into one buffer first;
+        # the transport can write them out together
+        self.transport.writelines(outgoing)
 
     def _send_command(self, command: str, *params: str):
         """
@@ -207,8 +368,10 @@ class ClientProtocol(asyncio.Protocol, LogMixin, metaclass=ABCMeta):
         """
         Schedules a command to be sent in a given number of seconds.
 
+        :param timeout: the number of seconds to wait before sending the command.
+        :param command: the command to construct
+        :param params: any parameters the command expects
+        :return: the handle for the scheduled command, which may be used to cancel it.
         """
         loop = asyncio.get_event_loop()
-        send_command = functools.partial(self._send_command, command, *params)
-        loop.call_later(timeout, send_command)
-        # TODO : store the callback from loop.call_later() somewhere, so we can cancel messages
+        return loop.call_later(timeout, self._send_command, command, *params)
@@ -145,5 +145,5 @@ CODE_TO_NAME = {
 
 NAMES = [v for v in CODE_TO_NAME.values()]
 
-NICK_ERRORS = ["ERR_NONICKNAMEGIVEN", "ERR_ERRONEUSNICKNAME", "ERR_NICKNAMEINUSE",
-               "ERR_NICKCOLLISION", "ERR_UNAVAILRESOURCE", "ERR_RESTRICTED"]
+NICK_ERRORS = frozenset(["ERR_NONICKNAMEGIVEN", "ERR_ERRONEUSNICKNAME", "ERR_NICKNAMEINUSE",
+                         "ERR_NICKCOLLISION", "ERR_UNAVAILRESOURCE", "ERR_RESTRICTED"])
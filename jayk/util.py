@@ -8,48 +8,69 @@ import logging.config
 class LogMixin:
     """
     A logging mixin class, which provides methods for writing log messages.
+
+    Each method checks the logger's level itself before passing the message along, so messages that
+    won't be emitted cost as little as possible. Code that logs on a hot path can go a step further
+    and check `self._logger.isEnabledFor()` before calling these at all.
     """
-    def __init__(self, logger_name: str):
+    def __init__(self, logger_name):
         """
         Creates the logger with the specified name.
 
-        :param logger_name: the name for this logger. When in doubt, use MyType.__name__.
+        :param logger_name: the name for this logger. When in doubt, use MyType.__name__. An
+                            existing logging.Logger may be passed instead, in which case it is used
+                            as-is.
         """
-        self.__logger = logging.getLogger(logger_name)
+        if isinstance(logger_name, logging.Logger):
+            self._logger = logger_name
+        else:
+            self._logger = logging.getLogger(logger_name)
 
     def critical(self, message, *args, **kwargs):
         """
         Passes a critical logging message on to the internal logger.
         """
-        self.__logger.critical(message, *args, **kwargs)
+        logger = self._logger
+        if logger.isEnabledFor(logging.CRITICAL):
+            logger.critical(message, *args, **kwargs)
 
     def error(self, message, *args, **kwargs):
         """
         Passes an error logging message on to the internal logger.
         """
-        self.__logger.error(message, *args, **kwargs)
+        logger = self._logger
+        if logger.isEnabledFor(logging.ERROR):
+            logger.error(message, *args, **kwargs)
 
     def warning(self, message, *args, **kwargs):
         """
         Passes an warning logging message on to the internal logger.
         """
-        self.__logger.warning(message, *args, **kwargs)
+        logger = self._logger
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning(message, *args, **kwargs)
 
     def info(self, message, *args, **kwargs):
         """
         Passes an info logging message on to the internal logger.
         """
-        self.__logger.info(message, *args, **kwargs)
+        logger = self._logger
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(message, *args, **kwargs)
 
     def debug(self, message, *args, **kwargs):
         """
         Passes a debug logging message on to the internal logger.
         """
-        self.__logger.debug(message, *args, **kwargs)
+        logger = self._logger
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(message, *args, **kwargs)
 
     def exception(self, message, *args, **kwargs):
         """
         Passes an exception logging message on to the internal logger. This should only be called
         when in the "except" clause of an exception handler.
         """
-        self.__logger.exception(message, *args, **kwargs)
+        logger = self._logger
+        if logger.isEnabledFor(logging.ERROR):
+            logger.exception(message, *args, **kwargs)
@@ -0,0 +1,85 @@
+"""Tests for jayk.cli.module."""
+import pytest
+
+pytest.importorskip('inotify')
+
+from jayk.cli.module import JaykMeta, jayk_command, _chunk_csv
+
+
+class Parent(metaclass=JaykMeta):
+    """
+    A module with a command and no on_message override.
+    """
+    def __init__(self):
+        self.calls = []
+
+    @jayk_command('!a')
+    def a(self, client, cmd, room, sender, msg):
+        self.calls.append(('a', msg))
+
+
+class OverrideParent(metaclass=JaykMeta):
+    """
+    A module with both a command and an on_message override.
+    """
+    def __init__(self):
+        self.calls = []
+
+    def on_message(self, client, room, sender, msg):
+        self.calls.append(('on_message', msg))
+
+    @jayk_command('!b')
+    def b(self, client, cmd, room, sender, msg):
+        self.calls.append(('b', msg))
+
+
+def dispatch(module, *messages):
+    for msg in messages:
+        module.on_message(None, '#room', None, msg)
+    return module.calls
+
+
+def test_commands():
+    assert dispatch(Parent(), '!a x', 'hello', '  !a') == [('a', '!a x'), ('a', '  !a')]
+
+
+def test_commands_with_override():
+    assert dispatch(OverrideParent(), '!b x', 'hello') == [('b', '!b x'), ('on_message', 'hello')]
+
+
+def test_subclass_without_override():
+    class Child(Parent):
+        pass
+
+    class CommandChild(Parent):
+        @jayk_command('!c')
+        def c(self, client, cmd, room, sender, msg):
+            self.calls.append(('c', msg))
+
+    # Commands aren't inherited
+    assert dispatch(Child(), '!a x') == []
+    assert dispatch(CommandChild(), '!a x', '!c x') == [('c', '!c x')]
+
+
+def test_subclass_override_calling_super():
+    class Child(Parent):
+        def on_message(self, client, room, sender, msg):
+            self.calls.append(('child', msg))
+            super().on_message(client, room, sender, msg)
+
+    class OverrideChild(OverrideParent):
+        def on_message(self, client, room, sender, msg):
+            self.calls.append(('child', msg))
+            super().on_message(client, room, sender, msg)
+
+    # The parent's on_message dispatches the subclass's commands, which it doesn't have
+    assert dispatch(Child(), '!a x') == [('child', '!a x')]
+    assert dispatch(OverrideChild(), '!b x') == [('child', '!b x'), ('on_message', '!b x')]
+
+
+def test_chunk_csv_limit():
+    rooms = ['#room{}'.format(i) for i in range(200)]
+    chunks = list(_chunk_csv(rooms, 50))
+    assert len(chunks) > 1
+    assert all(len(chunk.encode()) <= 50 for chunk in chunks)
+    assert ','.join(chunks).split(',') == rooms
@@ -0,0 +1,39 @@
+"""Tests for jayk.cli.util."""
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip('inotify')
+
+from jayk.cli.util import InotifyMultiplexer, register_file_watch
+
+
+def test_shared_watch(tmpdir):
+    path = str(tmpdir.join('watched.txt'))
+    with open(path, 'w') as f:
+        f.write('x')
+    loop = asyncio.new_event_loop()
+    hits = []
+    listeners = [register_file_watch(loop, name, lambda name=name: hits.append(name), 10)
+                 for name in (path, os.path.join(str(tmpdir), '.', 'watched.txt'), path)]
+
+    def modify():
+        with open(path, 'a') as f:
+            f.write('y')
+        loop.run_until_complete(asyncio.sleep(0.1))
+        result = sorted(hits)
+        hits.clear()
+        return result
+
+    try:
+        assert len(modify()) == 3
+        # The other listeners on the same file keep getting events
+        listeners[0].stop()
+        assert len(modify()) == 2
+        listeners[1].stop()
+        assert modify() == [path]
+        listeners[2].stop()
+        assert loop not in InotifyMultiplexer._InotifyMultiplexer__instances
+    finally:
+        loop.close()
@@ -0,0 +1,104 @@
+"""Tests for IRC messages and line framing."""
+import pytest
+
+from jayk.irc import ClientProtocol, ConnectInfo, Message
+
+
+class LineCollector(ClientProtocol):
+    """
+    A client protocol that keeps every line it receives.
+    """
+    def __init__(self):
+        super().__init__(ConnectInfo('irc.example.net', ['nick'], 'user'))
+        self.lines = []
+
+    def _line_received(self, line):
+        self.lines.append(line)
+
+
+def test_parse_prefix():
+    msg = Message.parse(':nick!user@host PRIVMSG #room :hello there')
+    assert msg.prefix == 'nick!user@host'
+    assert msg.command == 'PRIVMSG'
+    assert msg.params == ('#room', 'hello there')
+    assert msg.user.nick == 'nick'
+    assert msg.user.username == 'user'
+    assert msg.user.host == 'host'
+
+
+def test_parse_no_prefix():
+    msg = Message.parse('PING :irc.example.net')
+    assert msg.prefix is None
+    assert msg.command == 'PING'
+    assert msg.params == ('irc.example.net',)
+
+
+def test_parse_numeric():
+    msg = Message.parse(':irc.example.net 001 nick :Welcome')
+    assert msg.command == 'RPL_WELCOME'
+    assert msg.params == ('nick', 'Welcome')
+
+
+def test_parse_trailing():
+    msg = Message.parse('PRIVMSG #room :a :colon and  spaces ')
+    assert msg.params == ('#room', 'a :colon and  spaces ')
+
+
+def test_parse_empty_trailing():
+    msg = Message.parse('CMD :')
+    assert msg.command == 'CMD'
+    assert msg.params == ('',)
+
+
+def test_parse_no_params():
+    msg = Message.parse('CMD')
+    assert msg.command == 'CMD'
+    assert msg.params == ()
+
+
+def test_parse_extra_spaces():
+    msg = Message.parse('MODE  #room   +o  nick')
+    assert msg.params == ('#room', '+o', 'nick')
+
+
+@pytest.mark.parametrize('line', [':x', ': CMD', '1234 x'])
+def test_parse_invalid(line):
+    with pytest.raises(ValueError):
+        Message.parse(line)
+
+
+def test_data_received_split_line():
+    protocol = LineCollector()
+    protocol.data_received(b'PING :irc.exa')
+    assert protocol.lines == []
+    protocol.data_received(b'mple.net\r\nPRIVMSG #room :hi\r\n')
+    assert protocol.lines == ['PING :irc.example.net', 'PRIVMSG #room :hi']
+
+
+def test_data_received_bare_lf():
+    protocol = LineCollector()
+    protocol.data_received(b'PING :a\nPING :b\r\n\nPING :c')
+    protocol.data_received(b'\n')
+    assert protocol.lines == ['PING :a', 'PING :b', 'PING :c']
+
+
+def test_data_received_overlong():
+    protocol = LineCollector()
+    protocol.data_received(b'x' * 5000)
+    protocol.data_received(b'x' * 100)
+    protocol.data_received(b'TAILOFGARBAGE\r\nPING :a\r\n')
+    assert protocol.lines == ['PING :a']
+    protocol.data_received(b'PING :b\r\n')
+    assert protocol.lines == ['PING :a', 'PING :b']
+
+
+def test_message_changed_after_format():
+    msg = Message.parse(':nick!user@host PRIVMSG #room :hi')
+    assert str(msg) == ':nick!user@host PRIVMSG #room hi'
+    assert msg.user.nick == 'nick'
+    msg.params = ['#other', 'bye']
+    msg.prefix = 'other!user@host'
+    assert str(msg) == ':other!user@host PRIVMSG #other bye'
+    assert msg.user.nick == 'other'
+    msg.command = 'notice'
+    assert msg.to_wire_bytes() == b':other!user@host NOTICE #other bye\r\n'